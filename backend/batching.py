@@ -0,0 +1,34 @@
+import asyncio
+
+# ===============================
+# Queue Batching Helper
+# ===============================
+
+# Queued by a background batcher's stop(); the worker finishes the batch
+# it is collecting, processes what was queued ahead of it and exits.
+# Cancelling the task instead could drop items already taken off the queue.
+STOP = object()
+
+async def collect_batch(queue: asyncio.Queue, max_size: int, window: float) -> list:
+    """
+    Wait for the first queued item, then keep collecting until max_size
+    items are gathered or window seconds have passed since the first one.
+    """
+    loop = asyncio.get_running_loop()
+    batch = [await queue.get()]
+    deadline = loop.time() + window
+
+    while len(batch) < max_size:
+        if not queue.empty():
+            batch.append(queue.get_nowait())
+            continue
+
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+
+    return batch
@@ -0,0 +1,226 @@
+import numpy as np
+from numba import njit
+
+# ===============================
+# Hashed N-gram Features (Numba)
+# ===============================
+# Native-code replacement for HashingVectorizer.transform on the request
+# path. It reproduces the vectorizer used in train_model.py:
+#   lowercase=True, token_pattern=r"(?u)\b\w\w+\b", ngram_range=(1, 2),
+#   alternate_sign=False, norm="l2"
+# Only ASCII messages are supported: ASCII letters, digits and "_" are the
+# word characters, which is exactly what \w matches on ASCII text, so the
+# output matches scikit-learn. Unicode word boundaries and lowercasing
+# are not reproduced; callers send non-ASCII messages through sklearn.
+
+# HashingVectorizer settings the kernel reproduces (besides n_features)
+VECTORIZER_PARAMS = {
+    "analyzer": "word",
+    "lowercase": True,
+    "preprocessor": None,
+    "tokenizer": None,
+    "token_pattern": r"(?u)\b\w\w+\b",
+    "stop_words": None,
+    "strip_accents": None,
+    "ngram_range": (1, 2),
+    "alternate_sign": False,
+    "norm": "l2",
+}
+
+_C1 = np.uint32(0xCC9E2D51)
+_C2 = np.uint32(0x1B873593)
+
+
+@njit(cache=True)
+def _rotl32(x, r):
+    return ((x << np.uint32(r)) | (x >> np.uint32(32 - r))) & np.uint32(0xFFFFFFFF)
+
+
+@njit(cache=True)
+def _murmurhash3_32(buf, start, end, sep_at):
+    """
+    MurmurHash3 (x86, 32-bit, seed 0) of buf[start:end], signed like
+    sklearn's murmurhash3_32. When sep_at >= 0 the byte at that offset is
+    hashed as a space, which joins bigram tokens without copying.
+    """
+    length = end - start
+    h = np.uint32(0)
+    k = np.uint32(0)
+    nblocks = length // 4
+
+    for block in range(nblocks):
+        k = np.uint32(0)
+        for j in range(4):
+            pos = start + block * 4 + j
+            byte = np.uint32(32) if pos == sep_at else np.uint32(buf[pos])
+            k |= byte << np.uint32(8 * j)
+        k = (k * _C1) & np.uint32(0xFFFFFFFF)
+        k = _rotl32(k, 15)
+        k = (k * _C2) & np.uint32(0xFFFFFFFF)
+        h ^= k
+        h = _rotl32(h, 13)
+        h = (h * np.uint32(5) + np.uint32(0xE6546B64)) & np.uint32(0xFFFFFFFF)
+
+    tail = length & 3
+    if tail:
+        k = np.uint32(0)
+        for j in range(tail - 1, -1, -1):
+            pos = start + nblocks * 4 + j
+            byte = np.uint32(32) if pos == sep_at else np.uint32(buf[pos])
+            k ^= byte << np.uint32(8 * j)
+        k = (k * _C1) & np.uint32(0xFFFFFFFF)
+        k = _rotl32(k, 15)
+        k = (k * _C2) & np.uint32(0xFFFFFFFF)
+        h ^= k
+
+    h ^= np.uint32(length)
+    h ^= h >> np.uint32(16)
+    h = (h * np.uint32(0x85EBCA6B)) & np.uint32(0xFFFFFFFF)
+    h ^= h >> np.uint32(13)
+    h = (h * np.uint32(0xC2B2AE35)) & np.uint32(0xFFFFFFFF)
+    h ^= h >> np.uint32(16)
+
+    signed = np.int64(h)
+    if signed >= 2**31:
+        signed -= 2**32
+    return signed
+
+
+@njit(cache=True)
+def _is_word_byte(b):
+    return (
+        (b >= 48 and b <= 57)       # 0-9
+        or (b >= 65 and b <= 90)    # A-Z
+        or (b >= 97 and b <= 122)   # a-z
+        or b == 95                  # _
+    )
+
+
+@njit(cache=True)
+def _feature_index(h, n_features):
+    if h == -(2**31):
+        return (2**31 - 1 - (n_features - 1)) % n_features
+    return abs(h) % n_features
+
+
+@njit(cache=True)
+def _hash_row(buf, start, end, n_features, out_indices, out_data, nnz):
+    # Tokenize: runs of at least two word bytes
+    starts = np.empty((end - start) // 2 + 1, dtype=np.int64)
+    ends = np.empty_like(starts)
+    n_tokens = 0
+    pos = start
+    while pos < end:
+        if _is_word_byte(buf[pos]):
+            token_start = pos
+            while pos < end and _is_word_byte(buf[pos]):
+                pos += 1
+            if pos - token_start >= 2:
+                starts[n_tokens] = token_start
+                ends[n_tokens] = pos
+                n_tokens += 1
+        else:
+            pos += 1
+
+    n_grams = 2 * n_tokens - 1 if n_tokens else 0
+    row_indices = np.empty(n_grams, dtype=np.int64)
+
+    for t in range(n_tokens):
+        row_indices[t] = _feature_index(
+            _murmurhash3_32(buf, starts[t], ends[t], -1), n_features
+        )
+
+    # Bigrams "a b" are hashed in place over buf, with the gap read as a space.
+    # The gap is copied only when tokens are separated by more than one byte.
+    for t in range(n_tokens - 1):
+        if starts[t + 1] == ends[t] + 1:
+            h = _murmurhash3_32(buf, starts[t], ends[t + 1], ends[t])
+        else:
+            left = ends[t] - starts[t]
+            right = ends[t + 1] - starts[t + 1]
+            gram = np.empty(left + 1 + right, dtype=np.uint8)
+            gram[:left] = buf[starts[t]:ends[t]]
+            gram[left] = 32
+            gram[left + 1:] = buf[starts[t + 1]:ends[t + 1]]
+            h = _murmurhash3_32(gram, 0, gram.size, -1)
+        row_indices[n_tokens + t] = _feature_index(h, n_features)
+
+    # Sum duplicate indices, then L2-normalise
+    row_indices.sort()
+    row_start = nnz
+    for i in range(n_grams):
+        if nnz > row_start and out_indices[nnz - 1] == row_indices[i]:
+            out_data[nnz - 1] += 1.0
+        else:
+            out_indices[nnz] = row_indices[i]
+            out_data[nnz] = 1.0
+            nnz += 1
+
+    norm = 0.0
+    for i in range(row_start, nnz):
+        norm += out_data[i] * out_data[i]
+    if norm > 0.0:
+        norm = np.sqrt(norm)
+        for i in range(row_start, nnz):
+            out_data[i] /= norm
+
+    return nnz
+
+
+# nogil lets batches hash in parallel on the API's inference threads
+@njit(cache=True, nogil=True)
+def _hash_batch(buf, offsets, n_features):
+    n_rows = offsets.size - 1
+    capacity = buf.size + n_rows
+    indices = np.empty(capacity, dtype=np.int32)
+    data = np.empty(capacity, dtype=np.float64)
+    indptr = np.zeros(n_rows + 1, dtype=np.int32)
+
+    nnz = 0
+    for row in range(n_rows):
+        nnz = _hash_row(buf, offsets[row], offsets[row + 1], n_features, indices, data, nnz)
+        indptr[row + 1] = nnz
+
+    return indptr, indices[:nnz], data[:nnz]
+
+
+def hash_batch(messages, n_features):
+    """Hash a batch of ASCII messages into raw CSR arrays (indptr, indices, data)."""
+    if not all(message.isascii() for message in messages):
+        raise ValueError("hash_batch only supports ASCII messages")
+
+    encoded = [message.lower().encode("ascii") for message in messages]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(chunk) for chunk in encoded], out=offsets[1:])
+    buf = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    return _hash_batch(buf, offsets, n_features)
+
+
+# ===============================
+# Linear Scoring (Numba)
+# ===============================
+# Short log lines hash to a few dozen non-zeros, so gathering those rows
+# of the weight matrix directly beats building a scipy matrix and going
+# through a general sparse-dense product.
+
+@njit(cache=True, nogil=True, fastmath=True)
+def score_rows(indptr, indices, data, W_T, b):
+    """
+    Decision scores for CSR rows against W_T (n_features x n_classes)
+    plus intercept b; returns an (n_rows, n_classes) float32 array.
+    """
+    n_rows = indptr.size - 1
+    n_classes = W_T.shape[1]
+    out = np.empty((n_rows, n_classes), dtype=np.float32)
+
+    for row in range(n_rows):
+        for c in range(n_classes):
+            out[row, c] = b[c]
+        for k in range(indptr[row], indptr[row + 1]):
+            j = indices[k]
+            v = np.float32(data[k])
+            for c in range(n_classes):
+                out[row, c] += W_T[j, c] * v
+
+    return out
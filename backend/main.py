@@ -1,17 +1,26 @@
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from scipy.special import expit
+from sqlalchemy import select
 from dotenv import load_dotenv
-import redis
+import redis.asyncio as aioredis
 import joblib
-import json
-import datetime
+import numpy as np
+import msgspec
+import asyncio
+import contextlib
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import os
 import logging
 import random
 
-from database import SessionLocal, Incident, init_db
+from batching import STOP, collect_batch
+from kernels import VECTORIZER_PARAMS, hash_batch, score_rows
+from database import AsyncSessionLocal, Incident, incident_writer, init_db
 
 # ===============================
 # Load Environment Variables
@@ -69,77 +78,407 @@ app.add_middleware(
 # Load ML Model
 # ===============================
 current_dir = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(current_dir, "classifier.pkl")
-vectorizer_path = os.path.join(current_dir, "vectorizer.pkl")
+pipeline_path = os.path.join(current_dir, "pipeline.pkl")
 
 try:
-    model = joblib.load(model_path)
-    vectorizer = joblib.load(vectorizer_path)
+    # pipeline.pkl is built by train_model.py, not committed
+    if not os.path.exists(pipeline_path):
+        raise FileNotFoundError(f"{pipeline_path} not found; run train_model.py first")
+
+    # Arrays are memory-mapped read-only and shared between workers
+    pipeline = joblib.load(pipeline_path, mmap_mode="r")
+    vectorizer, classifier = pipeline[0], pipeline[-1]
+
+    # kernels.hash_batch only reproduces one vectorizer configuration
+    params = vectorizer.get_params()
+    if any(params[key] != value for key, value in VECTORIZER_PARAMS.items()):
+        raise ValueError(f"Unsupported vectorizer settings: {params}")
+    if classifier.loss != "log_loss":
+        raise ValueError(f"Unsupported classifier loss: {classifier.loss}")
     logger.info("✅ ML model loaded successfully.")
 except Exception as e:
     logger.error(f"❌ Failed to load ML model: {e}")
     raise RuntimeError("ML model loading failed.")
 
+# ===============================
+# Linear Scoring
+# ===============================
+# classifier.predict_proba re-validates its input on every call, which
+# costs far more than the product itself for a few sparse rows. The
+# weights are cached once, transposed so each feature's class weights
+# are contiguous, and scored by the Numba kernel straight from the
+# hashed CSR arrays. train_model.py already stores them in this layout,
+# so W_T stays a view of the mmapped file.
+W_T = np.ascontiguousarray(classifier.coef_.T, dtype=np.float32)
+B = classifier.intercept_.astype(np.float32)
+CLASSES = classifier.classes_
+
+def decision_scores(messages: list[str]):
+    """Per-class scores; the Numba hasher handles ASCII, sklearn the rest."""
+    if all(message.isascii() for message in messages):
+        return score_rows(*hash_batch(messages, vectorizer.n_features), W_T, B)
+
+    scores = np.empty((len(messages), W_T.shape[1]), dtype=np.float32)
+    ascii_rows = [i for i, message in enumerate(messages) if message.isascii()]
+    other_rows = [i for i, message in enumerate(messages) if not message.isascii()]
+
+    if ascii_rows:
+        ascii_messages = [messages[i] for i in ascii_rows]
+        scores[ascii_rows] = score_rows(
+            *hash_batch(ascii_messages, vectorizer.n_features), W_T, B
+        )
+
+    text_vectors = vectorizer.transform([messages[i] for i in other_rows])
+    scores[other_rows] = score_rows(
+        text_vectors.indptr, text_vectors.indices, text_vectors.data, W_T, B
+    )
+    return scores
+
+def predict_proba(messages: list[str]):
+    """Same probabilities as pipeline.predict_proba(messages)."""
+    probs = expit(decision_scores(messages))
+
+    # Binary models score only the positive class
+    if probs.shape[1] == 1:
+        return np.hstack([1.0 - probs, probs])
+
+    # Multiclass is one-vs-rest, normalised across classes
+    probs /= probs.sum(axis=1, keepdims=True)
+    return probs
+
+# Compile (or load cached) Numba kernels for both the ASCII and the
+# sklearn fallback paths before the first request
+predict_proba(["warm up", "warm up \u00e9"])
+
+# ===============================
+# Prediction Batcher
+# ===============================
+# Concurrent requests are coalesced so hashing and predict_proba run once
+# over up to PREDICT_BATCH_SIZE messages instead of once per message.
+# Each batch is scored on a thread pool so the event loop keeps serving
+# requests meanwhile. The Numba hashing kernel releases the GIL, so
+# consecutive batches can also overlap with each other.
+
+PREDICT_BATCH_SIZE = int(os.getenv("PREDICT_BATCH_SIZE", "64"))
+PREDICT_BATCH_WINDOW = float(os.getenv("PREDICT_BATCH_WINDOW", "0.005"))
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", str(os.cpu_count() or 1)))
+
+# Ops logs repeat the same messages constantly. Predictions only depend
+# on the message and the loaded model, so the most recent
+# PREDICTION_CACHE_SIZE results are memoized per worker (0 disables).
+# Entries are keyed by a 16-byte digest so arbitrarily long messages
+# do not grow the cache.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+
+inference_executor = ThreadPoolExecutor(
+    max_workers=INFERENCE_THREADS, thread_name_prefix="inference"
+)
+
+def run_inference(messages: list[str]) -> tuple[list[str], list[float]]:
+    probs = predict_proba(messages)
+
+    # Label and confidence both come from the one probability pass
+    best = probs.argmax(axis=1)
+    labels = CLASSES[best].tolist()
+    confidences = probs[np.arange(len(messages)), best].tolist()
+    return labels, confidences
+
+class PredictionBatcher:
+    def __init__(self, batch_size=PREDICT_BATCH_SIZE, window=PREDICT_BATCH_WINDOW):
+        self.batch_size = batch_size
+        self.window = window
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._task = None
+        self._in_flight = set()
+        self._cache: OrderedDict[bytes, tuple[str, float]] = OrderedDict()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            await self.queue.put(STOP)
+            await self._task
+            self._task = None
+
+        # Score anything queued after the stop marker
+        while not self.queue.empty():
+            await self._predict(await collect_batch(self.queue, self.batch_size, 0))
+
+        await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def submit(self, message: str) -> tuple[str, float]:
+        """Queue a message and wait for its (priority, confidence)."""
+        key = self._cache_key(message)
+        cached = self._cache.get(key)
+        if cached:
+            self._cache.move_to_end(key)
+            return cached
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((message, future))
+        return await future
+
+    @staticmethod
+    def _cache_key(message: str) -> bytes:
+        return hashlib.blake2b(message.encode(), digest_size=16).digest()
+
+    def _remember(self, message: str, result: tuple[str, float]):
+        if PREDICTION_CACHE_SIZE <= 0:
+            return
+        key = self._cache_key(message)
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        if len(self._cache) > PREDICTION_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    async def _run(self):
+        while True:
+            batch = await collect_batch(self.queue, self.batch_size, self.window)
+            stopping = any(item is STOP for item in batch)
+            batch = [item for item in batch if item is not STOP]
+
+            if batch:
+                # Keep collecting the next batch while this one is scored
+                task = asyncio.create_task(self._predict(batch))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+            if stopping:
+                return
+
+    async def _predict(self, batch):
+        messages = [message for message, _ in batch]
+        loop = asyncio.get_running_loop()
+
+        try:
+            labels, confidences = await loop.run_in_executor(
+                inference_executor, run_inference, messages
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (message, future), label, confidence in zip(batch, labels, confidences):
+            self._remember(message, (label, confidence))
+            if not future.done():
+                future.set_result((label, confidence))
+
+batcher = PredictionBatcher()
+
 # ===============================
 # Redis Setup
 # ===============================
+# The asyncio client lets other requests run while a Redis call is in
+# flight. Connection errors surface lazily on first use, which is why
+# every Redis call below is wrapped in its own try/except.
 REDIS_URL = os.getenv("REDIS_URL")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
 
 try:
     if REDIS_URL:
-        r = redis.from_url(REDIS_URL, decode_responses=True)
+        r = aioredis.from_url(
+            REDIS_URL, decode_responses=True, max_connections=REDIS_MAX_CONNECTIONS
+        )
         logger.info("✅ Connected to Redis (env).")
     else:
-        r = redis.Redis(host="localhost", port=6379, decode_responses=True)
+        r = aioredis.Redis(
+            host="localhost",
+            port=6379,
+            decode_responses=True,
+            max_connections=REDIS_MAX_CONNECTIONS,
+        )
         logger.info("⚠️ Connected to local Redis.")
 except Exception as e:
     logger.warning(f"Redis unavailable: {e}")
     r = None  # Fail gracefully
 
+# The most recent incidents are kept in a Redis sorted set scored by id
+# and capped at RECENT_INCIDENTS_LIMIT, so /api/v1/logs can usually be
+# answered without touching the database and in the same id DESC order
+# as the DB query, even when batched writes from several workers are
+# published out of id order.
+# New incidents are also published on a channel that every worker
+# subscribes to, so WebSocket clients see incidents from all workers.
+RECENT_INCIDENTS_KEY = "incidents:recent_by_id"
+RECENT_INCIDENTS_LIMIT = 50
+INCIDENT_EVENTS_CHANNEL = "incidents:events"
+
+async def publish_incident(incident_id: int, payload: bytes):
+    """Cache and publish an incident in one pipelined round trip."""
+    async with r.pipeline() as pipe:
+        pipe.zadd(RECENT_INCIDENTS_KEY, {payload: incident_id})
+        pipe.zremrangebyrank(RECENT_INCIDENTS_KEY, 0, -RECENT_INCIDENTS_LIMIT - 1)
+        pipe.set("latest_incident", payload)
+        pipe.publish(INCIDENT_EVENTS_CHANNEL, payload)
+        await pipe.execute()
+
 # ===============================
 # WebSocket Manager
 # ===============================
+# Every subscriber gets a bounded outbound queue drained by its own
+# task, so one slow dashboard cannot hold up delivery to the others.
+# When a queue is full the oldest frame is dropped.
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "128"))
+
+class Subscriber:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+        self.task = None
+
+    def push(self, payload: bytes):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(payload)
+
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        # Keyed by socket for O(1) add/remove; values carry the send queue
+        self.active_connections: dict[WebSocket, Subscriber] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        subscriber = Subscriber(websocket)
+        subscriber.task = asyncio.create_task(self._send_loop(subscriber))
+        self.active_connections[websocket] = subscriber
         logger.info("WebSocket connected.")
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        subscriber = self.active_connections.pop(websocket, None)
+        if subscriber:
+            subscriber.task.cancel()
             logger.info("WebSocket disconnected.")
 
-    async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                disconnected.append(connection)
+    async def broadcast(self, payload: bytes):
+        # Binary frames reuse the already-encoded JSON for every client
+        # instead of UTF-8 encoding a str once per connection.
+        for subscriber in self.active_connections.values():
+            subscriber.push(payload)
 
-        for conn in disconnected:
-            self.disconnect(conn)
+    async def _send_loop(self, subscriber: Subscriber):
+        try:
+            while True:
+                payload = await subscriber.queue.get()
+                await subscriber.websocket.send_bytes(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.disconnect(subscriber.websocket)
 
 manager = ConnectionManager()
 
+# ===============================
+# Incident Event Relay
+# ===============================
+# Reconnects back off exponentially up to RELAY_MAX_BACKOFF seconds, and
+# only changes in connection state are logged, so a deployment without
+# Redis does not log once a second forever. While the relay is not
+# subscribed, predict_log broadcasts to this worker's sockets itself.
+RELAY_MAX_BACKOFF = 5
+
+relay_subscribed = False
+
+async def relay_incident_events():
+    """Forward incidents published by any worker to this worker's sockets."""
+    global relay_subscribed
+    delay = 1
+    connected = None
+
+    while True:
+        try:
+            async with r.pubsub() as pubsub:
+                await pubsub.subscribe(INCIDENT_EVENTS_CHANNEL)
+                if connected is False:
+                    logger.info("Redis subscription restored.")
+                connected = True
+                relay_subscribed = True
+                delay = 1
+
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        # decode_responses hands us str; frames are sent as bytes
+                        await manager.broadcast(message["data"].encode())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            relay_subscribed = False
+            if connected is not False:
+                logger.warning(f"Redis subscription unavailable, retrying with backoff: {e}")
+            connected = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RELAY_MAX_BACKOFF)
+        finally:
+            relay_subscribed = False
+
+relay_task = None
+
 # ===============================
 # Startup Event
 # ===============================
 @app.on_event("startup")
-def startup_event():
-    init_db()
+async def startup_event():
+    await init_db()
+    incident_writer.start()
+    batcher.start()
     logger.info("✅ Database initialized.")
 
+    global relay_task
+    if r:
+        relay_task = asyncio.create_task(relay_incident_events())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await batcher.stop()
+    inference_executor.shutdown(wait=False)
+    await incident_writer.stop()
+    if relay_task:
+        relay_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await relay_task
+    if r:
+        await r.aclose()
+
+# ===============================
+# Simulated Source Services
+# ===============================
+SERVICES = (
+    "Auth-Service",
+    "Payment-Gateway",
+    "Database-Cluster",
+    "User-Profile-API",
+)
+_rng = random.Random()
+
 # ===============================
 # Pydantic Model
 # ===============================
 class LogRequest(BaseModel):
     message: str
 
+# ===============================
+# Response Schemas
+# ===============================
+# Incident payloads are msgspec Structs encoded in native code, with no
+# per-field introspection or validation on the way out.
+class IncidentOut(msgspec.Struct):
+    id: int
+    message: str
+    priority: str
+    confidence: float
+    source: str
+    timestamp: str
+
+class PredictResponse(msgspec.Struct):
+    status: str
+    data: IncidentOut
+
+json_encoder = msgspec.json.Encoder()
+
+def json_response(content: bytes) -> Response:
+    return Response(content=content, media_type="application/json")
+
 # ===============================
 # Health Check
 # ===============================
@@ -155,106 +494,105 @@ async def predict_log(log: LogRequest):
 
     try:
         # ML Prediction
-        text_vector = vectorizer.transform([log.message])
-        probs = model.predict_proba(text_vector)[0]
-        prediction = model.predict(text_vector)[0]
-        confidence = float(max(probs))
+        prediction, confidence = await batcher.submit(log.message)
 
     except Exception as e:
         logger.error(f"ML prediction failed: {e}")
         raise HTTPException(status_code=500, detail="Prediction failed")
 
     # Simulated Source Service
-    services = [
-        "Auth-Service",
-        "Payment-Gateway",
-        "Database-Cluster",
-        "User-Profile-API",
-    ]
-    source = random.choice(services)
-
-    db = SessionLocal()
-    timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    source = _rng.choice(SERVICES)
 
     try:
-        new_incident = Incident(
+        incident_id, timestamp = await incident_writer.write(
             message=log.message,
             priority=prediction,
-            timestamp=timestamp,
             source_service=source,
             confidence_score=confidence,
         )
 
-        db.add(new_incident)
-        db.commit()
-        db.refresh(new_incident)
-
-        response_data = {
-            "id": new_incident.id,
-            "message": new_incident.message,
-            "priority": prediction,
-            "confidence": round(confidence, 2),
-            "source": source,
-            "timestamp": timestamp,
-        }
-
     except Exception as e:
-        db.rollback()
         logger.error(f"Database error: {e}")
         raise HTTPException(status_code=500, detail="Database error")
 
-    finally:
-        db.close()
-
-    # Redis Cache (Optional)
+    incident = IncidentOut(
+        id=incident_id,
+        message=log.message,
+        priority=prediction,
+        confidence=round(confidence, 2),
+        source=source,
+        timestamp=timestamp.isoformat(),
+    )
+
+    # Serialize once for both Redis and the WebSocket broadcast
+    payload = json_encoder.encode(incident)
+
+    # Redis Cache + Broadcast; sockets are fed by relay_incident_events
+    # in every worker. If the publish fails or this worker's relay is not
+    # subscribed, broadcast to local sockets directly.
+    published = False
     if r:
         try:
-            r.set("latest_incident", json.dumps(response_data))
+            await publish_incident(incident.id, payload)
+            published = True
         except Exception as e:
-            logger.warning(f"Redis caching failed: {e}")
+            logger.warning(f"Redis publish failed: {e}")
 
-    # Broadcast WebSocket
-    await manager.broadcast(json.dumps(response_data))
+    if not (published and relay_subscribed):
+        await manager.broadcast(payload)
 
-    return {
-        "status": "success",
-        "data": response_data,
-    }
+    return json_response(json_encoder.encode(PredictResponse(status="success", data=incident)))
 
 # ===============================
 # Get Recent Logs
 # ===============================
 @app.get("/api/v1/logs")
-def get_logs():
-
-    db = SessionLocal()
+async def get_logs():
 
-    try:
-        logs = (
-            db.query(Incident)
-            .order_by(Incident.id.desc())
-            .limit(50)
-            .all()
-        )
-
-        return [
-            {
-                "id": log.id,
-                "message": log.message,
-                "priority": log.priority,
-                "timestamp": log.timestamp,
-                "source": log.source_service,
-                "confidence": log.confidence_score,
-            }
-            for log in logs
-        ]
+    # Serve from Redis only when it holds a full page; a partially
+    # filled set (e.g. after a Redis restart) falls back to the DB.
+    # Both paths return the same entries: id DESC, confidence rounded
+    # to 2 decimals as in the predict response.
+    if r:
+        try:
+            cached = await r.zrevrange(RECENT_INCIDENTS_KEY, 0, RECENT_INCIDENTS_LIMIT - 1)
+            if len(cached) == RECENT_INCIDENTS_LIMIT:
+                # Entries are already JSON; join them instead of re-encoding
+                return json_response(("[" + ",".join(cached) + "]").encode())
+        except Exception as e:
+            logger.warning(f"Redis read failed: {e}")
 
-    except Exception as e:
-        logger.error(f"Log retrieval failed: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch logs")
+    async with AsyncSessionLocal() as db:
+        try:
+            # Plain column tuples skip ORM object hydration on this read-only path
+            result = await db.execute(
+                select(
+                    Incident.id,
+                    Incident.message,
+                    Incident.priority,
+                    Incident.timestamp,
+                    Incident.source_service,
+                    Incident.confidence_score,
+                )
+                .order_by(Incident.id.desc())
+                .limit(RECENT_INCIDENTS_LIMIT)
+            )
+
+            return json_response(json_encoder.encode([
+                IncidentOut(
+                    id=incident_id,
+                    message=message,
+                    priority=priority,
+                    confidence=round(confidence, 2),
+                    source=source,
+                    timestamp=timestamp.isoformat(),
+                )
+                for incident_id, message, priority, timestamp, source, confidence in result
+            ]))
 
-    finally:
-        db.close()
+        except Exception as e:
+            logger.error(f"Log retrieval failed: {e}")
+            raise HTTPException(status_code=500, detail="Failed to fetch logs")
 
 # ===============================
 # WebSocket Endpoint
@@ -0,0 +1,75 @@
+import asyncio
+
+from database import IncidentWriter
+
+
+class SlowWriter(IncidentWriter):
+    """IncidentWriter whose flush takes a while and records what it wrote."""
+
+    def __init__(self):
+        super().__init__(batch_size=10, flush_interval=0.01)
+        self.written = []
+        self.flushing = asyncio.Event()
+
+    async def _flush(self, batch):
+        self.flushing.set()
+        await asyncio.sleep(0.05)
+        for values, future in batch:
+            self.written.append(values["message"])
+            future.set_result((len(self.written), None))
+
+
+def test_stop_during_flush_resolves_every_write():
+    async def scenario():
+        writer = SlowWriter()
+        writer.start()
+
+        first = asyncio.create_task(writer.write(message="first"))
+        await writer.flushing.wait()
+        second = asyncio.create_task(writer.write(message="second"))
+        await asyncio.sleep(0)
+
+        await writer.stop()
+        return writer.written, first.done(), second.done()
+
+    written, first_done, second_done = asyncio.run(scenario())
+
+    assert written == ["first", "second"]
+    assert first_done and second_done
+
+
+class RejectingWriter(IncidentWriter):
+    """IncidentWriter whose database rejects messages containing NUL, like Postgres."""
+
+    def __init__(self):
+        super().__init__(batch_size=10, flush_interval=0.01)
+        self.inserts = []
+
+    async def _insert(self, rows):
+        self.inserts.append(len(rows))
+        if any("\x00" in values["message"] for values in rows):
+            raise ValueError("invalid byte sequence for encoding UTF8: 0x00")
+        return [(len(self.inserts), None) for _ in rows]
+
+
+def test_rejected_row_fails_only_its_own_write():
+    async def scenario():
+        writer = RejectingWriter()
+        writer.start()
+
+        results = await asyncio.gather(
+            writer.write(message="first"),
+            writer.write(message="bad\x00row"),
+            writer.write(message="third"),
+            return_exceptions=True,
+        )
+
+        await writer.stop()
+        return writer.inserts, results
+
+    inserts, results = asyncio.run(scenario())
+
+    assert inserts == [3, 1, 1, 1]
+    assert isinstance(results[1], ValueError)
+    assert not isinstance(results[0], Exception)
+    assert not isinstance(results[2], Exception)
@@ -0,0 +1,70 @@
+import random
+import string
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from kernels import VECTORIZER_PARAMS, hash_batch, score_rows
+
+N_FEATURES = 2**18
+
+ASCII_MESSAGES = [
+    "",
+    "a",
+    "ab",
+    "Server is down",
+    "Database connection timed out",
+    "ERROR: db-01 timeout (code=504)  retry  in 5s",
+    "Disk_usage at 70%!!",
+    "x y z",
+    "ab" * 50,
+    "  lead  and trail  ",
+    "abc\tdef\nghi",
+    "repeat repeat repeat repeat",
+]
+
+
+def random_ascii_messages(count, seed=0):
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + string.punctuation + " \t"
+    return [
+        "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 120)))
+        for _ in range(count)
+    ]
+
+
+def kernel_matrix(messages):
+    indptr, indices, data = hash_batch(messages, N_FEATURES)
+    return sp.csr_matrix((data, indices, indptr), shape=(len(messages), N_FEATURES))
+
+
+@pytest.mark.parametrize(
+    "messages", [ASCII_MESSAGES, random_ascii_messages(2000)], ids=["edge", "random"]
+)
+def test_hash_batch_matches_sklearn(messages):
+    vectorizer = HashingVectorizer(n_features=N_FEATURES, **VECTORIZER_PARAMS)
+
+    expected = vectorizer.transform(messages)
+    actual = kernel_matrix(messages)
+
+    assert actual.nnz == expected.nnz
+    assert abs(actual - expected).max() < 1e-12
+
+
+def test_hash_batch_rejects_non_ascii():
+    with pytest.raises(ValueError):
+        hash_batch(["naïve—test"], N_FEATURES)
+
+
+def test_score_rows_matches_dense_product():
+    rng = np.random.default_rng(0)
+    W_T = rng.standard_normal((N_FEATURES, 4)).astype(np.float32)
+    b = rng.standard_normal(4).astype(np.float32)
+    messages = ASCII_MESSAGES + random_ascii_messages(50, seed=1)
+
+    indptr, indices, data = hash_batch(messages, N_FEATURES)
+    expected = kernel_matrix(messages) @ W_T + b
+
+    np.testing.assert_allclose(score_rows(indptr, indices, data, W_T, b), expected, rtol=1e-4, atol=1e-4)
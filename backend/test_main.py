@@ -0,0 +1,113 @@
+import asyncio
+
+import numpy as np
+
+import main
+
+MESSAGES = [
+    "Server is down",
+    "Payment API failure",
+    "Ünïcödé — error… café",
+    "foo\xa0bar baz",
+    "naïve—test",
+    "İstanbul failure",
+    "",
+    # Training vocabulary joined by non-ASCII punctuation and spaces
+    "Server\u2014down",
+    "Database\xa0connection timed out",
+    "Payment API failure\u2026retry",
+    "\u201cUnauthorized\u201d access detected",
+]
+
+
+def test_predict_proba_matches_pipeline_for_mixed_batches():
+    expected = main.pipeline.predict_proba(MESSAGES)
+
+    np.testing.assert_allclose(main.predict_proba(MESSAGES), expected, atol=1e-6)
+
+
+def test_predict_proba_matches_pipeline_for_non_ascii_only():
+    messages = [message for message in MESSAGES if not message.isascii()]
+    expected = main.pipeline.predict_proba(messages)
+
+    np.testing.assert_allclose(main.predict_proba(messages), expected, atol=1e-6)
+
+
+def test_batcher_stop_resolves_collected_and_queued_messages():
+    async def scenario():
+        batcher = main.PredictionBatcher(batch_size=2, window=0.05)
+        batcher.start()
+
+        tasks = [
+            asyncio.create_task(batcher.submit(message))
+            for message in ["Server is down", "Payment API failure", "Disk at 70%"]
+        ]
+        # Let the batcher take the first messages off the queue mid-window
+        await asyncio.sleep(0.01)
+
+        await batcher.stop()
+        return [task.done() and task.result() for task in tasks]
+
+    results = asyncio.run(scenario())
+
+    assert all(results)
+
+
+class CountingBatcher(main.PredictionBatcher):
+    """PredictionBatcher that records the messages it actually scores."""
+
+    def __init__(self):
+        super().__init__(window=0)
+        self.scored = []
+
+    async def _predict(self, batch):
+        self.scored.extend(message for message, _ in batch)
+        await super()._predict(batch)
+
+
+def test_prediction_cache_hit_skips_scoring():
+    async def scenario():
+        batcher = CountingBatcher()
+        batcher.start()
+
+        first = await batcher.submit("Server is down")
+        second = await batcher.submit("Server is down")
+
+        await batcher.stop()
+        return first, second, batcher.scored
+
+    first, second, scored = asyncio.run(scenario())
+
+    assert first == second
+    assert scored == ["Server is down"]
+
+
+def test_prediction_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(main, "PREDICTION_CACHE_SIZE", 2)
+    batcher = main.PredictionBatcher()
+
+    batcher._remember("a", ("Low", 0.1))
+    batcher._remember("b", ("Low", 0.2))
+    assert asyncio.run(batcher.submit("a")) == ("Low", 0.1)  # hit refreshes "a"
+    batcher._remember("c", ("Low", 0.3))
+
+    assert list(batcher._cache) == [batcher._cache_key("a"), batcher._cache_key("c")]
+
+
+def test_prediction_cache_size_zero_disables_caching(monkeypatch):
+    monkeypatch.setattr(main, "PREDICTION_CACHE_SIZE", 0)
+    batcher = main.PredictionBatcher()
+
+    batcher._remember("a", ("Low", 0.1))
+
+    assert not batcher._cache
+
+
+def test_subscriber_push_drops_oldest_frame_when_full(monkeypatch):
+    monkeypatch.setattr(main, "WS_QUEUE_SIZE", 2)
+    subscriber = main.Subscriber(websocket=None)
+
+    for payload in (b"1", b"2", b"3"):
+        subscriber.push(payload)
+
+    assert [subscriber.queue.get_nowait() for _ in range(2)] == [b"2", b"3"]
@@ -1,6 +1,8 @@
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+import csv
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import make_pipeline
 import joblib
 import os  # <--- Add this
 
@@ -10,7 +12,9 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 csv_path = os.path.join(current_dir, 'data.csv')
 
 try:
-    df = pd.read_csv(csv_path)
+    # csv keeps the build-time training step to the packages in requirements.txt
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
     print(f"Data loaded successfully from: {csv_path}")
 except FileNotFoundError:
     print(f"Error: data.csv not found at: {csv_path}")
@@ -19,19 +23,32 @@ except FileNotFoundError:
 # ... rest of the code stays the same ...
 
 # 2. Prepare Data
-X = df['message']
-y = df['priority']
-
-# 3. Vectorize Text (Turn words into numbers)
-vectorizer = TfidfVectorizer()
-X_vectorized = vectorizer.fit_transform(X)
+X = [row['message'] for row in rows]
+y = [row['priority'] for row in rows]
+
+# 3. Build Pipeline (Hash words into numbers, then classify)
+# Hashing needs no vocabulary, so inference skips the dict lookups.
+# The pickle size is fixed by n_features (a dense n_classes x n_features
+# weight matrix), not by how large the training vocabulary is.
+pipeline = make_pipeline(
+    HashingVectorizer(n_features=2**18, ngram_range=(1, 2), alternate_sign=False, norm='l2'),
+    SGDClassifier(loss='log_loss', random_state=42),
+)
 
 # 4. Train Model
-model = LogisticRegression()
-model.fit(X_vectorized, y)
-
-# 5. Save the Model and Vectorizer
-joblib.dump(model, 'classifier.pkl')
-joblib.dump(vectorizer, 'vectorizer.pkl')
+pipeline.fit(X, y)
+
+# 5. Store Weights in the Layout the API Scores With
+# float32 in Fortran order makes coef_.T a C-contiguous (n_features x
+# n_classes) matrix, so main.py can use the memory-mapped array as is.
+classifier = pipeline[-1]
+classifier.coef_ = np.asfortranarray(classifier.coef_, dtype=np.float32)
+classifier.intercept_ = classifier.intercept_.astype(np.float32)
+
+# 6. Save the Pipeline
+# pipeline.pkl is a build artifact and is not committed; run this script
+# after installing requirements, before starting the API. Uncompressed so joblib can memory-map the arrays; every API worker
+# then shares one copy of the weights through the OS page cache.
+joblib.dump(pipeline, os.path.join(current_dir, 'pipeline.pkl'), compress=0)
 
 print("Model trained and saved successfully!")
\ No newline at end of file
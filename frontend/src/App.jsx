@@ -16,6 +16,8 @@ import toast, { Toaster } from "react-hot-toast";
 const API_URL = import.meta.env.VITE_API_URL;
 const WS_URL = import.meta.env.VITE_WS_URL;
 
+const textDecoder = new TextDecoder();
+
 // =============================
 // MAIN APP
 // =============================
@@ -121,9 +123,15 @@ function Dashboard() {
 
     const connectWebSocket = () => {
       wsRef.current = new WebSocket(WS_URL);
+      // Incidents arrive as binary frames holding UTF-8 JSON
+      wsRef.current.binaryType = "arraybuffer";
 
       wsRef.current.onmessage = (event) => {
-        const message = JSON.parse(event.data);
+        const text =
+          typeof event.data === "string"
+            ? event.data
+            : textDecoder.decode(event.data);
+        const message = JSON.parse(text);
 
         setLogs((prev) => {
           const updated = [message, ...prev].slice(0, 100);
@@ -251,7 +259,7 @@ function Dashboard() {
                 <tbody>
                   {filteredLogs.map((log, i) => (
                     <tr key={i}>
-                      <td>{log.timestamp}</td>
+                      <td>{new Date(log.timestamp).toLocaleString()}</td>
                       <td>{log.source || "System"}</td>
                       <td>{log.message}</td>
                       <td>